@@ -1,15 +1,32 @@
 from flask import Flask, request, render_template, redirect, url_for, flash, session, jsonify
-import json
 import os
+import sqlite3
+from contextlib import closing
 import uuid
+import hashlib
+import tempfile
 import math
 import re
 import logging
 import subprocess
+import itertools
+import queue
+import threading
+import time
+import atexit
+import functools
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import base58
+import orjson
+import numpy as np
 from solders.keypair import Keypair
 from cryptography.fernet import Fernet
+from werkzeug.exceptions import RequestEntityTooLarge
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 logging.basicConfig(
     filename='log.txt',
@@ -18,37 +35,217 @@ logging.basicConfig(
 )
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Required for session handling
+# Required for session handling; set FLASK_SECRET_KEY so all workers and restarts share it
+app.secret_key = os.environ.get("FLASK_SECRET_KEY") or os.urandom(24)
 app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # reject larger request bodies with 413
+UPLOAD_CHUNK_SIZE = 64 * 1024
+os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-USERS_FILE = "users.json"
+USERS_FILE = "users.json"  # legacy store, imported into USERS_DB on first start
+USERS_DB = "users.db"
 POINTS_FILE = "points.json"
+POP_DENSITY_CACHE_FILE = "pop_density_cache.json"
+POP_DENSITY_CACHE_TTL = 24 * 60 * 60  # seconds
+POP_DENSITY_CACHE_MAXSIZE = 4096  # least recently used cells are evicted beyond this
 
-# Generate encryption key (Run once and store securely)
-encryption_key = Fernet.generate_key()
+# Shared HTTP session so Overpass/Wikidata calls reuse pooled keep-alive connections
+HTTP_TIMEOUT = (3, 15)  # (connect, read) seconds
+HTTP_SESSION = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+)
+HTTP_SESSION.mount("https://", _http_adapter)
+HTTP_SESSION.mount("http://", _http_adapter)
+
+# Worker threads for concurrent Wikidata lookups; they share HTTP_SESSION's pool
+WIKIDATA_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+FERNET_KEY_FILE = os.environ.get("FERNET_KEY_FILE", ".fernet.key")
+
+# Function to load (or create once) the wallet encryption key
+def load_encryption_key():
+    """
+    Returns the Fernet key from FERNET_KEY, else from FERNET_KEY_FILE, creating
+    that file (mode 0600) on first start. The key must stay the same for every
+    worker and across restarts, otherwise stored private keys can't be decrypted.
+    """
+    env_key = os.environ.get("FERNET_KEY")
+    if env_key:
+        return env_key.encode()
+    if os.path.exists(FERNET_KEY_FILE):
+        with open(FERNET_KEY_FILE, "rb") as f:
+            return f.read().strip()
+    key = Fernet.generate_key()
+    # Write the key to a private (0600) temp file first and hard-link it into place,
+    # so FERNET_KEY_FILE only ever appears complete. If another process links first,
+    # its key wins and is used here too.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(FERNET_KEY_FILE)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(tmp_path, FERNET_KEY_FILE)
+        except FileExistsError:  # another process created it first
+            with open(FERNET_KEY_FILE, "rb") as f:
+                return f.read().strip()
+    finally:
+        os.remove(tmp_path)
+    logging.info("Generated new encryption key in %s", FERNET_KEY_FILE)
+    return key
+
+encryption_key = load_encryption_key()
 cipher_suite = Fernet(encryption_key)
 
-# Function to save users to JSON file
-def save_users(users):
-    """Saves the current users dictionary to users.json file."""
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
+# Function to open a connection to the users database
+def get_db():
+    """Opens a connection to users.db. Callers are responsible for closing it."""
+    conn = sqlite3.connect(USERS_DB)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
 
-# Function to load users from JSON file
-def load_users():
-    """Loads users from users.json. If missing or invalid, resets it."""
+# Function to create the users database schema
+def init_db():
+    """Creates the users/nfts tables and switches the database to WAL mode."""
+    with closing(get_db()) as conn, conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                solana_public_key TEXT NOT NULL,
+                solana_private_key TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS nfts (
+                username TEXT NOT NULL REFERENCES users(username),
+                idx INTEGER NOT NULL,
+                name TEXT,
+                description TEXT,
+                image_path TEXT,
+                latitude REAL,
+                longitude REAL,
+                rarity INTEGER,
+                PRIMARY KEY (username, idx)
+            )
+        """)
+
+# Function to add a new user to the database
+def insert_user(conn, username, user):
+    """Inserts a user row. Raises sqlite3.IntegrityError if the username is taken."""
+    conn.execute(
+        "INSERT INTO users (username, password, solana_public_key, solana_private_key) VALUES (?, ?, ?, ?)",
+        (username, user["password"], user["solana_public_key"], user["solana_private_key"])
+    )
+
+# Function to add an NFT record for a user to the database
+def insert_nft(conn, username, idx, name, description, image_path, latitude, longitude, rarity):
+    """Inserts the idx-th NFT of a user."""
+    conn.execute(
+        "INSERT INTO nfts (username, idx, name, description, image_path, latitude, longitude, rarity) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (username, idx, name, description, image_path, latitude, longitude, rarity)
+    )
+
+# Function to import the legacy users.json file into the database
+def import_users_json(conn):
+    """Copies users (and their NFTs) from users.json into an empty users.db."""
     if not os.path.exists(USERS_FILE):
-        save_users({})
+        return
     try:
-        with open(USERS_FILE, "r") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        print("⚠️ Warning: users.json was empty or corrupted. Resetting it.")
-        save_users({})
-        return {}
-
-# Load users into memory
+        with open(USERS_FILE, "rb") as f:
+            legacy_users = orjson.loads(f.read())
+    except orjson.JSONDecodeError:
+        logging.warning("users.json was empty or corrupted; skipping import")
+        return
+    for username, user in legacy_users.items():
+        insert_user(conn, username, user)
+        columns = [user.get(key, []) for key in ("descriptions", "image_paths", "latitude", "longitude", "rarity")]
+        for idx, name in enumerate(user.get("nft_names", [])):
+            values = [column[idx] if idx < len(column) else None for column in columns]
+            insert_nft(conn, username, idx, name, *values)
+    logging.info("Imported %d users from %s", len(legacy_users), USERS_FILE)
+
+# Function to load users from the database
+def load_users():
+    """Loads all users and their NFTs from users.db into the in-memory cache."""
+    init_db()
+    users = {}
+    with closing(get_db()) as conn, conn:
+        if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            import_users_json(conn)
+        for username, password, public_key, private_key in conn.execute(
+                "SELECT username, password, solana_public_key, solana_private_key FROM users"):
+            users[username] = _user_record(password, public_key, private_key)
+        for username, *nft in conn.execute(
+                "SELECT username, name, description, image_path, latitude, longitude, rarity "
+                "FROM nfts ORDER BY username, idx"):
+            _append_nft(users[username], *nft)
+    return users
+
+def _user_record(password, public_key, private_key):
+    """Builds an in-memory user entry with empty NFT lists."""
+    return {
+        "password": password,
+        "solana_public_key": public_key,
+        "solana_private_key": private_key,
+        'nft_names': [],
+        'descriptions': [],
+        'image_paths': [],
+        'latitude': [],
+        'longitude': [],
+        'rarity': []
+    }
+
+def _append_nft(user, name, description, image_path, latitude, longitude, rarity):
+    """Appends one NFT to an in-memory user entry."""
+    user['nft_names'].append(name)
+    user['descriptions'].append(description)
+    user['image_paths'].append(image_path)
+    user['latitude'].append(latitude)
+    user['longitude'].append(longitude)
+    user['rarity'].append(rarity)
+
+# Load users into memory (read-through cache; users.db is the source of truth)
 users = load_users()
+# Serializes writes to users.db and the users cache across request/job threads
+users_lock = threading.RLock()
+
+# Function to look up a user, reading through to the database on a cache miss
+def get_user(username):
+    """
+    Returns the user entry for username, or None if there is no such user.
+    Users missing from this process's cache (e.g. signed up through another
+    worker process) are read from users.db and cached.
+    """
+    if not username:
+        return None
+    user = users.get(username)
+    if user is not None:
+        return user
+    with users_lock:
+        user = users.get(username)
+        if user is not None:
+            return user
+        with closing(get_db()) as conn:
+            row = conn.execute(
+                "SELECT password, solana_public_key, solana_private_key FROM users WHERE username = ?",
+                (username,)
+            ).fetchone()
+            if row is None:
+                return None
+            user = _user_record(*row)
+            for nft in conn.execute(
+                    "SELECT name, description, image_path, latitude, longitude, rarity "
+                    "FROM nfts WHERE username = ? ORDER BY idx", (username,)):
+                _append_nft(user, *nft)
+        users[username] = user
+        return user
 
 # Function to create a Solana wallet
 def create_solana_wallet():
@@ -74,7 +271,7 @@ def get_osm_administrative_areas(lat, lon):
     out body;
     """
     try:
-        response = requests.get(overpass_url, params={"data": overpass_query})
+        response = HTTP_SESSION.get(overpass_url, params={"data": overpass_query}, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         areas = []
@@ -98,10 +295,113 @@ def get_osm_administrative_areas(lat, lon):
         logging.error(f"OSM request error: {str(e)}")
         return []
 
-def get_population_and_area_wikidata(wikidata_id):
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+WBGETENTITIES_MAX_IDS = 50  # API limit per wbgetentities request
+# OSM wikidata tags are occasionally blank or malformed (e.g. "Q1;Q2"); one bad ID
+# would make wbgetentities reject the whole request, so only well-formed IDs are sent.
+WIKIDATA_ID_RE = re.compile(r"Q[0-9]+")
+NO_POPULATION_DATA = {"error": "No population or area data found for this Wikidata ID."}
+
+# Conversion factors from Wikidata area units (P2046) to square kilometres
+AREA_UNITS_KM2 = {
+    "http://www.wikidata.org/entity/Q712226": 1.0,  # square kilometre
+    "http://www.wikidata.org/entity/Q25343": 1e-6,  # square metre
+    "http://www.wikidata.org/entity/Q35852": 0.01,  # hectare
+    "http://www.wikidata.org/entity/Q232291": 2.589988110336,  # square mile
+}
+
+def _population_record(population, area):
+    """Builds the population/area/density dict returned by the Wikidata lookups."""
+    if area:
+        density = population / area
+        return {
+            "population": population,
+            "area_km2": area,
+            "population_density": density
+        }
+    else:
+        return {
+            "population": population,
+            "area_km2": "Unknown",
+            "population_density": "Cannot calculate (no area data)"
+        }
+
+def _claim_quantity(claims, prop):
     """
-    Queries Wikidata to fetch the population and area for a given Wikidata ID.
-    Uses a UNION query to try retrieving the population from the truthy property or statement.
+    Returns (amount, unit) of the best-ranked quantity claim for a property,
+    preferring "preferred" rank like the truthy wdt: SPARQL prefix does.
+    """
+    statements = [c for c in claims.get(prop, []) if c.get("rank") != "deprecated"]
+    statements.sort(key=lambda c: c.get("rank") != "preferred")
+    for claim in statements:
+        value = claim.get("mainsnak", {}).get("datavalue", {}).get("value")
+        if isinstance(value, dict) and "amount" in value:
+            return value["amount"], value.get("unit")
+    return None
+
+def _entity_population_record(entity):
+    """Extracts population (P1082) and area (P2046) from a wbgetentities entity."""
+    claims = entity.get("claims", {})
+    population_claim = _claim_quantity(claims, "P1082")
+    if population_claim is None:
+        return {"error": "No population or area data found for this Wikidata ID."}
+    try:
+        population = int(float(population_claim[0]))
+    except ValueError:
+        return {"error": "Population data is not valid."}
+    area = None
+    area_claim = _claim_quantity(claims, "P2046")
+    if area_claim is not None:
+        amount, unit = area_claim
+        try:
+            area = float(amount) * AREA_UNITS_KM2.get(unit, 1.0)
+        except ValueError:
+            area = None
+    return _population_record(population, area)
+
+def batch_fetch_entities(qids):
+    """
+    Fetches population and area for many Wikidata IDs with wbgetentities,
+    one request per WBGETENTITIES_MAX_IDS IDs.
+    Malformed IDs are not sent and get the "no data" error.
+    Returns {qid: population dict or {"error": ...}}, or None if the API call failed.
+    """
+    qids = list(dict.fromkeys(qids))
+    valid_qids = [qid for qid in qids if WIKIDATA_ID_RE.fullmatch(qid or "")]
+    results = {}
+    for start in range(0, len(valid_qids), WBGETENTITIES_MAX_IDS):
+        chunk = valid_qids[start:start + WBGETENTITIES_MAX_IDS]
+        params = {
+            "action": "wbgetentities",
+            "format": "json",
+            "props": "claims",
+            "ids": "|".join(chunk)
+        }
+        try:
+            response = HTTP_SESSION.get(WIKIDATA_API_URL, params=params, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Wikidata wbgetentities error: {str(e)}")
+            return None
+        if "error" in data:
+            logging.error(f"Wikidata wbgetentities error: {data['error'].get('info')}")
+            return None
+        for qid, entity in data.get("entities", {}).items():
+            record = _entity_population_record(entity)
+            results[qid] = record
+            redirected_from = entity.get("redirects", {}).get("from")
+            if redirected_from:
+                results[redirected_from] = record
+    for qid in qids:
+        results.setdefault(qid, dict(NO_POPULATION_DATA))
+    return results
+
+@functools.lru_cache(maxsize=4096)
+def _fetch_population_and_area_wikidata(wikidata_id):
+    """
+    Runs the Wikidata population/area query for a Wikidata ID.
+    Request errors propagate so that only real answers end up in the cache.
     """
     wikidata_url = "https://query.wikidata.org/sparql"
     sparql_query = f"""
@@ -118,100 +418,183 @@ def get_population_and_area_wikidata(wikidata_id):
     }} LIMIT 1
     """
     headers = {"Accept": "application/json"}
-    try:
-        response = requests.get(wikidata_url, params={"query": sparql_query, "format": "json"}, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        if ("results" in data and "bindings" in data["results"] and 
-            len(data["results"]["bindings"]) > 0):
-            result = data["results"]["bindings"][0]
+    response = HTTP_SESSION.get(wikidata_url, params={"query": sparql_query, "format": "json"}, headers=headers, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    if ("results" in data and "bindings" in data["results"] and 
+        len(data["results"]["bindings"]) > 0):
+        result = data["results"]["bindings"][0]
+        try:
+            population = int(result["population"]["value"])
+        except (KeyError, ValueError):
+            return {"error": "Population data is not valid."}
+        area = None
+        if "area" in result:
             try:
-                population = int(result["population"]["value"])
-            except (KeyError, ValueError):
-                return {"error": "Population data is not valid."}
-            area = None
-            if "area" in result:
-                try:
-                    area = float(result["area"]["value"])
-                except ValueError:
-                    area = None
-            if area:
-                density = population / area
-                return {
-                    "population": population,
-                    "area_km2": area,
-                    "population_density": density
-                }
-            else:
-                return {
-                    "population": population,
-                    "area_km2": "Unknown",
-                    "population_density": "Cannot calculate (no area data)"
-                }
-        return {"error": "No population or area data found for this Wikidata ID."}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Request failed: {str(e)}"}
+                area = float(result["area"]["value"])
+            except ValueError:
+                area = None
+        return _population_record(population, area)
+    return {"error": "No population or area data found for this Wikidata ID."}
 
-def search_alternative_wikidata_ids(area_name):
+def get_population_and_area_wikidata(wikidata_id):
     """
-    Searches Wikidata for alternative entities matching the given area name.
+    Queries Wikidata to fetch the population and area for a given Wikidata ID.
+    Uses a UNION query to try retrieving the population from the truthy property or statement.
+    Results are memoized per Wikidata ID since populations change rarely.
     """
-    search_url = "https://www.wikidata.org/w/api.php"
+    try:
+        return dict(_fetch_population_and_area_wikidata(wikidata_id))
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Request failed: {str(e)}"}
+
+@functools.lru_cache(maxsize=4096)
+def _search_wikidata_ids(area_name):
+    """Runs the Wikidata entity search; request errors propagate uncached."""
+    search_url = WIKIDATA_API_URL
     params = {
         "action": "wbsearchentities",
         "search": area_name,
         "language": "en",
         "format": "json"
     }
+    response = HTTP_SESSION.get(search_url, params=params, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    data = response.json()
+    results = data.get("search", [])
+    return tuple(r["id"] for r in results)
+
+def search_alternative_wikidata_ids(area_name):
+    """
+    Searches Wikidata for alternative entities matching the given area name.
+    """
     try:
-        response = requests.get(search_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        results = data.get("search", [])
-        return [r["id"] for r in results]
+        return list(_search_wikidata_ids(area_name))
     except requests.exceptions.RequestException as e:
         logging.error(f"Wikidata search error: {str(e)}")
         return []
 
+# LRU population density cache keyed by coordinates rounded to ~100 m, least
+# recently used first: {(lat, lon): (timestamp, result)}
+_pd_cache = OrderedDict()
+_pd_cache_lock = threading.Lock()
+
+def _pd_cache_put(key, timestamp, result):
+    """Stores a cache entry as most recently used, evicting beyond POP_DENSITY_CACHE_MAXSIZE. Caller holds _pd_cache_lock."""
+    _pd_cache[key] = (timestamp, result)
+    _pd_cache.move_to_end(key)
+    while len(_pd_cache) > POP_DENSITY_CACHE_MAXSIZE:
+        _pd_cache.popitem(last=False)
+
+def load_pop_density_cache():
+    """Loads the population density cache from disk, dropping expired entries."""
+    if not os.path.exists(POP_DENSITY_CACHE_FILE):
+        return
+    try:
+        with open(POP_DENSITY_CACHE_FILE, "rb") as f:
+            entries = orjson.loads(f.read())
+    except (orjson.JSONDecodeError, OSError):
+        logging.warning("%s was empty or corrupted; ignoring it", POP_DENSITY_CACHE_FILE)
+        return
+    now = time.time()
+    with _pd_cache_lock:
+        # Oldest first, so the newest entries survive the size bound.
+        for entry in sorted(entries, key=lambda entry: entry["timestamp"]):
+            if now - entry["timestamp"] < POP_DENSITY_CACHE_TTL:
+                _pd_cache_put((entry["lat"], entry["lon"]), entry["timestamp"], entry["result"])
+
+def save_pop_density_cache():
+    """Saves the population density cache to disk so restarts start warm."""
+    with _pd_cache_lock:
+        items = list(_pd_cache.items())
+    entries = [
+        {"lat": key[0], "lon": key[1], "timestamp": timestamp, "result": result}
+        for key, (timestamp, result) in items
+    ]
+    tmp_path = POP_DENSITY_CACHE_FILE + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(entries))
+    os.replace(tmp_path, POP_DENSITY_CACHE_FILE)
+
+load_pop_density_cache()
+atexit.register(save_pop_density_cache)
+
 def get_population_density(lat, lon):
+    """
+    Returns the population density for a given location, serving repeated
+    lookups within ~100 m from the cache for up to POP_DENSITY_CACHE_TTL seconds.
+    """
+    key = (round(lat, 3), round(lon, 3))
+    with _pd_cache_lock:
+        cached = _pd_cache.get(key)
+        if cached is not None:
+            if time.time() - cached[0] < POP_DENSITY_CACHE_TTL:
+                _pd_cache.move_to_end(key)
+                return dict(cached[1])
+            del _pd_cache[key]  # expired
+    result = _lookup_population_density(lat, lon)
+    if "error" not in result:
+        with _pd_cache_lock:
+            _pd_cache_put(key, time.time(), result)
+    return dict(result)
+
+def _density_result(area, population_data, alt_id=None):
+    """Combines an administrative area with its Wikidata population data."""
+    result = {
+        "location": area["name"],
+        "admin_level": area["admin_level"],
+        "population": population_data["population"],
+        "area_km2": population_data["area_km2"],
+        "population_density": population_data["population_density"]
+    }
+    if alt_id:
+        result["wikidata_id"] = alt_id
+    return result
+
+def _lookup_population_density(lat, lon):
     """
     Combines OSM and Wikidata methods to compute population density for a given location.
     """
     areas = get_osm_administrative_areas(lat, lon)
     if not areas:
         return {"error": "No administrative areas found for this location."}
+    # One wbgetentities round-trip for every area; per-ID SPARQL only if that fails.
+    entities = batch_fetch_entities([area["wikidata_id"] for area in areas])
+    if entities is None:
+        logging.info("Batch Wikidata lookup failed; falling back to per-area SPARQL queries.")
+    # Smallest area whose own Wikidata ID has data wins.
     for area in areas:
         wikidata_id = area["wikidata_id"]
         logging.info(f"Trying area '{area['name']}' with Wikidata ID: {wikidata_id}")
-        population_data = get_population_and_area_wikidata(wikidata_id)
-        if "error" not in population_data:
-            return {
-                "location": area["name"],
-                "admin_level": area["admin_level"],
-                "population": population_data["population"],
-                "area_km2": population_data["area_km2"],
-                "population_density": population_data["population_density"]
-            }
+        if entities is not None:
+            population_data = entities.get(wikidata_id, NO_POPULATION_DATA)
+        elif not WIKIDATA_ID_RE.fullmatch(wikidata_id or ""):
+            population_data = NO_POPULATION_DATA
         else:
-            logging.info(f"Area '{area['name']}' (Wikidata ID: {wikidata_id}) did not return valid data.")
-            alternatives = search_alternative_wikidata_ids(area["name"])
-            for alt_id in alternatives:
-                if alt_id == wikidata_id:
-                    continue
-                logging.info(f"Trying alternative Wikidata ID: {alt_id} for area '{area['name']}'")
-                alt_population_data = get_population_and_area_wikidata(alt_id)
-                if "error" not in alt_population_data:
-                    return {
-                        "location": area["name"],
-                        "admin_level": area["admin_level"],
-                        "population": alt_population_data["population"],
-                        "area_km2": alt_population_data["area_km2"],
-                        "population_density": alt_population_data["population_density"],
-                        "wikidata_id": alt_id
-                    }
-            logging.info(f"No alternative Wikidata IDs for '{area['name']}' returned valid data. Trying a larger area...")
+            population_data = get_population_and_area_wikidata(wikidata_id)
+        if "error" not in population_data:
+            return _density_result(area, population_data)
+        logging.info(f"Area '{area['name']}' (Wikidata ID: {wikidata_id}) did not return valid data.")
+    # No area's own ID had data: search alternative entities for the smallest area only.
+    area = areas[0]
+    alternatives = [alt_id for alt_id in search_alternative_wikidata_ids(area["name"]) if alt_id != area["wikidata_id"]]
+    # Query all alternatives concurrently but keep the search ranking when picking one.
+    futures = [WIKIDATA_EXECUTOR.submit(get_population_and_area_wikidata, alt_id) for alt_id in alternatives]
+    try:
+        for alt_id, future in zip(alternatives, futures):
+            logging.info(f"Trying alternative Wikidata ID: {alt_id} for area '{area['name']}'")
+            alt_population_data = future.result()
+            if "error" not in alt_population_data:
+                return _density_result(area, alt_population_data, alt_id)
+    finally:
+        for future in futures:
+            future.cancel()
+    logging.info(f"No alternative Wikidata IDs for '{area['name']}' returned valid data.")
     return {"error": "Could not fetch population or area data from Wikidata for any administrative area."}
 
+# Population density bounds (people/km2) between rarity 1|2, 2|3 and 3|4
+RARITY_THRESHOLDS = (25.0, 100.0, 500.0)
+
 def determine_rarity(population_density):
     """
     Determines rarity based on population density.
@@ -223,14 +606,7 @@ def determine_rarity(population_density):
     """
     if not isinstance(population_density, (int, float)):
         return None
-    if population_density < 25:
-        return 1
-    elif population_density < 100:
-        return 2
-    elif population_density < 500:
-        return 3
-    else:
-        return 4
+    return bisect_right(RARITY_THRESHOLDS, population_density) + 1
 
 # --- Population Density Functions Integration End ---
 
@@ -244,7 +620,7 @@ def signup():
         if not username or not password:
             logging.info("here 2: Missing username or password")
             return jsonify({"success": False, "message": "Username and password are required."}), 400
-        if username in users:
+        if get_user(username) is not None:
             logging.info("here 3: Username already exists")
             return jsonify({"success": False, "message": "Username already exists."}), 400
         logging.info("here 4: Generating Solana wallet")
@@ -252,19 +628,16 @@ def signup():
         logging.info("here 5: Encrypting private key")
         encrypted_private_key = cipher_suite.encrypt(wallet["secret_key"].encode()).decode()
         logging.info("here 6: Storing user info with wallet details")
-        users[username] = {
-            "password": password,
-            "solana_public_key": wallet["public_key"],
-            "solana_private_key": encrypted_private_key,
-            'nft_names': [],
-            'descriptions': [],
-            'image_paths': [],
-            'latitude': [],
-            'longitude': [],
-            'rarity': []  # New array to store rarity values for each NFT.
-        }
+        user = _user_record(password, wallet["public_key"], encrypted_private_key)
         logging.info("here 7: Saving users")
-        save_users(users)
+        try:
+            with users_lock:
+                with closing(get_db()) as conn, conn:
+                    insert_user(conn, username, user)
+                users[username] = user
+        except sqlite3.IntegrityError:
+            logging.info("here 3: Username already exists")
+            return jsonify({"success": False, "message": "Username already exists."}), 400
         logging.info("here 8: Signup successful")
         return jsonify({
             "success": True,
@@ -283,10 +656,11 @@ def login():
     password = request.form.get('password')
     if not username or not password:
         return jsonify({"success": False, "message": "Username and password are required."}), 400
-    if users.get(username) == password:
+    user = get_user(username)
+    if user and user["password"] == password:
         return jsonify({"success": True, 
                         "message": "Login successful.",
-                        "solana_public_key": users[username]["solana_public_key"]}), 200
+                        "solana_public_key": user["solana_public_key"]}), 200
     else:
         return jsonify({"success": False, "message": "Invalid username or password."}), 401
 
@@ -297,49 +671,98 @@ def logout():
     flash("Logged out successfully!", "info")
     return redirect(url_for('login'))
 
-# Function to save points to JSON file
-def save_points(points):
+POINTS_FLUSH_DELAY = 0.5  # seconds; bursts of /add_point calls share one write
+_points_dirty = threading.Event()
+_points_write_lock = threading.Lock()
+
+# Function to write points to JSON file right away
+def _save_points_now(points):
     """Saves points to points.json file."""
-    with open(POINTS_FILE, "w") as f:
-        json.dump(points, f, indent=4)
+    with _points_write_lock:
+        tmp_path = POINTS_FILE + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(points))
+        os.replace(tmp_path, POINTS_FILE)
+
+# Function to schedule saving points to JSON file
+def save_points(points):
+    """Marks points as changed; the flusher thread writes them within POINTS_FLUSH_DELAY seconds."""
+    _points_dirty.set()
+
+def _points_flusher():
+    """Background loop that coalesces pending point changes into single writes."""
+    while True:
+        _points_dirty.wait()
+        time.sleep(POINTS_FLUSH_DELAY)
+        _points_dirty.clear()
+        _save_points_now(list(points))
+
+def flush_points():
+    """Writes pending point changes immediately (used at shutdown)."""
+    if _points_dirty.is_set():
+        _points_dirty.clear()
+        _save_points_now(list(points))
 
 # Function to load points from JSON file
 def load_points():
     """Loads points from points.json. If missing or invalid, resets it."""
     if not os.path.exists(POINTS_FILE):
-        save_points([])
+        _save_points_now([])
     try:
-        with open(POINTS_FILE, "r") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        print("⚠️ Warning: points.json was empty or corrupted. Resetting it.")
-        save_points([])
+        with open(POINTS_FILE, "rb") as f:
+            return orjson.loads(f.read())
+    except (orjson.JSONDecodeError, FileNotFoundError):
+        logging.warning("points.json was empty or corrupted; resetting")
+        _save_points_now([])
         return []
 
-# Load points into memory
-points = load_points()
+# Load points into memory; a points.json holding null counts as empty
+points = load_points() or []
+# Guards points and the coordinate arrays: /add_point updates them together and
+# /nearby_points reads them together
+points_lock = threading.Lock()
+threading.Thread(target=_points_flusher, daemon=True).start()
+atexit.register(flush_points)
 
-# Haversine formula to calculate distance between two lat/lon points (miles)
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculates the distance (in miles) between two lat/lon points."""
+# Point coordinates in radians for vectorized distance queries, as (lat, lon) rows of a
+# growable buffer: rows [:_coords_count] are live and capacity doubles when full, so
+# /add_point is amortized O(1) instead of copying every coordinate on each insert.
+_coords_count = len(points)
+_coords_r = np.empty((max(16, 2 * _coords_count), 2), dtype=np.float64)
+_coords_r[:_coords_count] = np.radians(
+    np.array([(p["latitude"], p["longitude"]) for p in points], dtype=np.float64).reshape(-1, 2)
+)
+
+# Haversine formula to calculate distances between lat/lon points (miles)
+def haversine_many(lat, lon, lats, lons):
+    """Calculates the distances (in miles) from one lat/lon point to arrays of points, all in radians."""
     R = 3958.8  # Earth's radius in miles
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat, dlon = lat2 - lat1, lon2 - lon1
-    a = math.sin(dlat / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2)**2
-    return 2 * R * math.asin(math.sqrt(a))
+    dlat = lats - lat
+    dlon = lons - lon
+    a = np.sin(dlat / 2)**2 + math.cos(lat) * np.cos(lats) * np.sin(dlon / 2)**2
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
 
 # API endpoint to add a new point
 @app.route('/add_point', methods=['POST'])
 def add_point():
-    global points
+    global _coords_r, _coords_count
     data = request.get_json()
     lat, lon = data.get("latitude"), data.get("longitude")
     if lat is None or lon is None:
         return jsonify({"success": False, "message": "Latitude and longitude are required."}), 400
-    if points is None:
-        points = []
+    try:
+        lat_f, lon_f = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "Latitude and longitude must be numbers."}), 400
     new_point = {"uuid": str(uuid.uuid4()), "latitude": lat, "longitude": lon}
-    points.append(new_point)
+    with points_lock:
+        points.append(new_point)
+        if _coords_count == len(_coords_r):
+            grown = np.empty((2 * len(_coords_r), 2), dtype=np.float64)
+            grown[:_coords_count] = _coords_r[:_coords_count]
+            _coords_r = grown
+        _coords_r[_coords_count] = (math.radians(lat_f), math.radians(lon_f))
+        _coords_count += 1
     save_points(points)
     return jsonify({"success": True, "message": "Point added successfully.", "point": new_point}), 201
 
@@ -350,44 +773,232 @@ def nearby_points():
     lon = request.args.get("longitude", type=float)
     if lat is None or lon is None:
         return jsonify({"success": False, "message": "Latitude and longitude are required."}), 400
-    if points is None:
-        return jsonify({"success": True, "nearby_points": [], "count": 0})
-    nearby = [point for point in points if haversine(lat, lon, point["latitude"], point["longitude"]) <= 100]
+    # Snapshot the live rows: add_point only writes past them (or into a new buffer),
+    # and points only grows by appends, so indices into the snapshot stay valid.
+    with points_lock:
+        coords_r, points_snapshot = _coords_r[:_coords_count], points
+    lat_r_arr, lon_r_arr = coords_r[:, 0], coords_r[:, 1]
+    lat_r, lon_r = math.radians(lat), math.radians(lon)
+    # Cheap bounding box first; only candidates get the full haversine.
+    radius = 100 / 3958.8  # angular radius in radians
+    cos_lat = math.cos(lat_r)
+    candidates = np.abs(lat_r_arr - lat_r) <= radius + 1e-12
+    if math.sin(radius) < cos_lat:
+        dlon_max = math.asin(math.sin(radius) / cos_lat) + 1e-12
+        dlon = np.abs((lon_r_arr - lon_r + math.pi) % (2 * math.pi) - math.pi)
+        candidates &= dlon <= dlon_max
+    idx = np.flatnonzero(candidates)
+    distances = haversine_many(lat_r, lon_r, lat_r_arr[idx], lon_r_arr[idx])
+    nearby = [points_snapshot[i] for i in idx[distances <= 100]]
     return jsonify({"success": True, "nearby_points": nearby, "count": len(nearby)})
 
 # Retrieve Wallet Details (Securely)
 @app.route('/get_wallet', methods=['POST'])
 def get_wallet():
     username = request.form.get('username')
-    if not username or username not in users:
+    user = get_user(username)
+    if user is None:
         return jsonify({"success": False, "message": "User not found."}), 404
-    decrypted_key = cipher_suite.decrypt(users[username]["solana_private_key"].encode()).decode()
+    decrypted_key = cipher_suite.decrypt(user["solana_private_key"].encode()).decode()
     return jsonify({
-        "solana_public_key": users[username]["solana_public_key"],
+        "solana_public_key": user["solana_public_key"],
         "solana_private_key": decrypted_key
     })
 
 @app.route('/get_belonging', methods=['GET'])
 def get_belongings():
     username = request.form.get('username')
+    user = get_user(username)
     return jsonify({
-        "nft_names": users[username]['nft_names'],
-        "descriptions": users[username]['descriptions'],
-        "image_paths": users[username]['image_paths']
+        "nft_names": user['nft_names'],
+        "descriptions": user['descriptions'],
+        "image_paths": user['image_paths']
     })
 
-# Updated upload endpoint integrating population density and rarity calculation.
+# Long-running Node.js worker that mints and sends NFTs (see nft_worker.js).
+# Replies are read from its stdout by a reader thread, so waiting for one can
+# time out on every platform (select() only handles sockets on Windows).
+NFT_WORKER_COMMAND = ['node', 'nft_worker.js']
+NFT_WORKER_TIMEOUT = 180  # seconds to wait for one reply (minting waits on Arweave and Solana)
+NFT_PROC = None
+NFT_REPLIES = None  # queue of reply lines from the current worker; None marks EOF
+NFT_LOCK = threading.Lock()
+_nft_command_ids = itertools.count(1)
+
+def _pump_nft_replies(stdout, replies):
+    """Forwards lines from a worker's stdout to its reply queue until EOF."""
+    for line in stdout:
+        replies.put(line)
+    replies.put(None)
+
+def _start_nft_worker():
+    """Starts the NFT worker and its reply reader thread. Caller holds NFT_LOCK."""
+    global NFT_PROC, NFT_REPLIES
+    logging.info("Starting NFT worker: %s", NFT_WORKER_COMMAND)
+    NFT_PROC = subprocess.Popen(NFT_WORKER_COMMAND, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, bufsize=1, text=True)
+    # Each worker gets its own queue, so lines from a killed worker are never read.
+    NFT_REPLIES = queue.Queue()
+    threading.Thread(target=_pump_nft_replies, args=(NFT_PROC.stdout, NFT_REPLIES), daemon=True).start()
+
+def _kill_nft_worker():
+    """Kills the NFT worker so the next call starts a fresh one. Caller holds NFT_LOCK."""
+    global NFT_PROC, NFT_REPLIES
+    if NFT_PROC is not None and NFT_PROC.poll() is None:
+        NFT_PROC.kill()
+        NFT_PROC.wait()
+    NFT_PROC = NFT_REPLIES = None
+
+def nft_worker_call(command):
+    """
+    Sends one JSON command to the NFT worker and returns its reply, starting
+    (or restarting) the worker if needed. A reply that times out, can't be
+    parsed or carries the wrong id means the protocol is out of step, so the
+    worker is killed and restarted on the next call. Raises RuntimeError on failure.
+    """
+    command = {**command, "id": next(_nft_command_ids)}
+    with NFT_LOCK:
+        if NFT_PROC is None or NFT_PROC.poll() is not None:
+            _kill_nft_worker()
+            _start_nft_worker()
+        try:
+            NFT_PROC.stdin.write(orjson.dumps(command).decode() + "\n")
+            NFT_PROC.stdin.flush()
+        except OSError:
+            _kill_nft_worker()
+            raise RuntimeError("NFT worker exited unexpectedly.")
+        try:
+            line = NFT_REPLIES.get(timeout=NFT_WORKER_TIMEOUT)
+        except queue.Empty:
+            line = None
+        if line is None:
+            _kill_nft_worker()
+            raise RuntimeError("NFT worker exited or timed out.")
+        try:
+            reply = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            _kill_nft_worker()
+            raise RuntimeError("NFT worker sent an unreadable reply.")
+        if not isinstance(reply, dict) or reply.get("id") != command["id"]:
+            _kill_nft_worker()
+            raise RuntimeError("NFT worker reply did not match the command.")
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error") or "NFT worker command failed.")
+    return reply
+
+def stop_nft_worker():
+    """Closes the NFT worker's stdin so it exits after finishing queued commands."""
+    if NFT_PROC is not None and NFT_PROC.poll() is None:
+        NFT_PROC.stdin.close()
+
+atexit.register(stop_nft_worker)
+
+JOB_TTL = 60 * 60  # seconds a finished job's status stays available
+
+# Background NFT jobs keyed by job ID: {"status", "message", "mint_address", "rarity", "finished_at"}
+jobs = {}
+jobs_lock = threading.Lock()
+
+def finish_job(job_id, **fields):
+    """Records a job's final status and when it finished, so prune_jobs can evict it later."""
+    jobs[job_id].update(fields, finished_at=time.time())
+
+def prune_jobs():
+    """Drops jobs that finished more than JOB_TTL seconds ago. Caller holds jobs_lock."""
+    cutoff = time.time() - JOB_TTL
+    expired = [job_id for job_id, job in jobs.items()
+               if job["finished_at"] is not None and job["finished_at"] < cutoff]
+    for job_id in expired:
+        del jobs[job_id]
+
+def process_nft_job(job_id, username, file_path, nft_name, description, recipient_pubkey, lat, long_val):
+    """Mints and sends an NFT via the NFT worker, then records it with its rarity. Runs in a background thread."""
+    try:
+        jobs[job_id]["status"] = "running"
+        jobs[job_id]["message"] = "Minting started"
+        mint_request = {"cmd": "mint", "image_path": file_path, "name": nft_name,
+                        "symbol": 'MYNFT', "description": description}
+        logging.info("Job %s: Sending mint command: %s", job_id, mint_request)
+        mint_address = nft_worker_call(mint_request)["mint_address"]
+        jobs[job_id]["mint_address"] = mint_address
+        logging.info("Job %s: Mint address: %s", job_id, mint_address)
+        send_request = {"cmd": "send", "mint_address": mint_address, "recipient": recipient_pubkey}
+        logging.info("Job %s: Sending send command: %s", job_id, send_request)
+        nft_worker_call(send_request)
+        logging.info("Job %s: NFT sent to %s", job_id, recipient_pubkey)
+        # Calculate population density and determine rarity
+        try:
+            lat_val = float(lat)
+            lon_val = float(long_val)
+            pop_density_data = get_population_density(lat_val, lon_val)
+            rarity = None
+            if "error" not in pop_density_data and isinstance(pop_density_data.get("population_density"), (int, float)):
+                density = pop_density_data["population_density"]
+                rarity = determine_rarity(density)
+                logging.info("Job %s: Calculated rarity: %s based on density: %s", job_id, rarity, density)
+            else:
+                logging.info("Job %s: Population density data error: %s", job_id, pop_density_data.get("error"))
+        except Exception as ex:
+            logging.error("Job %s: Error calculating population density: %s", job_id, str(ex))
+            rarity = None
+        # Update user data with new NFT info including rarity.
+        logging.info("Job %s: Updating user data with NFT details", job_id)
+        with users_lock:
+            user = get_user(username)
+            with closing(get_db()) as conn, conn:
+                # Number from the database: another worker process may have added NFTs.
+                idx = conn.execute("SELECT COALESCE(MAX(idx) + 1, 0) FROM nfts WHERE username = ?",
+                                   (username,)).fetchone()[0]
+                insert_nft(conn, username, idx, nft_name, description, file_path, lat, long_val, rarity)
+            _append_nft(user, nft_name, description, file_path, lat, long_val, rarity)
+        logging.info("Job %s: User data saved successfully", job_id)
+        finish_job(job_id, status="completed", message="NFT minted and sent successfully!", rarity=rarity)
+    except RuntimeError as e:
+        logging.error("Job %s: Error minting or sending NFT: %s", job_id, str(e))
+        finish_job(job_id, status="error", message="Error minting or sending NFT. Check the server logs.")
+    except Exception as e:
+        logging.error("Job %s: Unhandled exception: %s", job_id, str(e))
+        finish_job(job_id, status="error", message="An internal error occurred.")
+
+def save_upload(file, upload_folder):
+    """
+    Streams an uploaded file to disk in chunks while hashing it and stores it as
+    <sha256><ext>, so identical images are only kept once. Returns the file path.
+    """
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+        ext = os.path.splitext(file.filename)[1].lower()
+        file_path = os.path.join(upload_folder, digest.hexdigest() + ext)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return file_path
+
+# Upload endpoint: saves the image and queues minting, sending and rarity calculation.
 @app.route('/upload', methods=['POST'])
 def upload():
     try:
         logging.info("upload route: Received upload request")
-        mint_address = None
         username = request.form.get('username')
         nft_name = request.form.get('name')
         description = request.form.get('description')
         lat = request.form.get('latitude')
         long_val = request.form.get('longitude')
         logging.info("upload route: Retrieved form fields for username, nft_name, description, lat, and long")
+        user = get_user(username)
+        if user is None:
+            logging.info("upload route: User not found")
+            return jsonify({"success": False, "message": "User not found."}), 404
         if 'image' not in request.files:
             logging.info("upload route: No image file provided")
             return jsonify({"success": False, "message": "No image file provided"}), 400
@@ -395,84 +1006,44 @@ def upload():
         if file.filename == '':
             logging.info("upload route: No selected image file")
             return jsonify({"success": False, "message": "No selected image file"}), 400
-        upload_folder = app.config['UPLOAD_FOLDER']
-        logging.info("upload route: Filename secured and upload folder set")
-        if not os.path.exists(upload_folder):
-            logging.info("upload route: Upload folder not found; creating directory")
-            os.makedirs(upload_folder)
-        file_path = os.path.join(upload_folder, file.filename)
-        file.save(file_path)
+        file_path = save_upload(file, app.config['UPLOAD_FOLDER'])
         logging.info("upload route: File saved at %s", file_path)
         image = file_path
-        recipient_pubkey = users[username]["solana_public_key"]
+        recipient_pubkey = user["solana_public_key"]
         logging.info("upload route: Retrieved recipient public key from user data")
         if not username or not nft_name or not description or not image or not recipient_pubkey:
             logging.info("upload route: Missing required fields for minting NFT")
             return jsonify({"success": False, "message": "error minting NFT."}), 400
-        mint_command = ['node', 'mintNft.js', file_path, nft_name, 'MYNFT', description]
-        logging.info("upload route: Running mint command: %s", mint_command)
-        try:
-            mint_output = subprocess.check_output(mint_command, stderr=subprocess.STDOUT)
-            mint_output_str = mint_output.decode()
-            logging.info("upload route: Mint Output: %s", mint_output_str)
-            match = re.search(r'NFT created with address:\s*(\S+)', mint_output_str)
-            if match:
-                mint_address = match.group(1)
-                logging.info("upload route: Mint address extracted: %s", mint_address)
-            else:
-                logging.info("upload route: Minting succeeded but mint address not found in output")
-                flash("Minting succeeded but mint address not found in output.")
-        except subprocess.CalledProcessError as e:
-            logging.error("upload route: Error minting NFT: %s", e.output.decode())
-            flash("Error minting NFT. Check the server logs.")
-            return jsonify({"success": False, "message": "error minting NFT."}), 400
-        send_command = ['node', 'sendNft.js', mint_address, recipient_pubkey]
-        logging.info("upload route: Running send command: %s", send_command)
-        try:
-            send_output = subprocess.check_output(send_command, stderr=subprocess.STDOUT)
-            logging.info("upload route: Send Output: %s", send_output.decode())
-        except subprocess.CalledProcessError as e:
-            logging.error("upload route: Error sending NFT: %s", e.output.decode())
-            flash("Error sending NFT. Check the server logs.")
-            return jsonify({"success": False, "message": "error sending NFT."}), 400
-        flash("NFT minted and sent successfully!")
-        if mint_address:
-            flash(f"NFT Mint Address: {mint_address}")
-        # Calculate population density and determine rarity
-        try:
-            lat_val = float(lat)
-            lon_val = float(long_val)
-            pop_density_data = get_population_density(lat_val, lon_val)
-            rarity = None
-            if "error" not in pop_density_data and isinstance(pop_density_data.get("population_density"), (int, float)):
-                density = pop_density_data["population_density"]
-                rarity = determine_rarity(density)
-                logging.info("upload route: Calculated rarity: %s based on density: %s", rarity, density)
-            else:
-                logging.info("upload route: Population density data error: %s", pop_density_data.get("error"))
-        except Exception as ex:
-            logging.error("upload route: Error calculating population density: %s", str(ex))
-            rarity = None
-        # Update user data with new NFT info including rarity.
-        logging.info("upload route: Updating user data with NFT details")
-        users[username]['nft_names'].append(nft_name)
-        users[username]['descriptions'].append(description)
-        users[username]['image_paths'].append(image)
-        users[username]['latitude'].append(lat)
-        users[username]['longitude'].append(long_val)
-        users[username]['rarity'].append(rarity)
-        save_users(users)
-        logging.info("upload route: User data saved successfully")
-        return jsonify({"success": True, "message": "NFT minted and sent successfully!"}), 200
+        job_id = str(uuid.uuid4())
+        with jobs_lock:
+            prune_jobs()
+            jobs[job_id] = {"status": "pending", "message": "Job queued", "mint_address": None,
+                            "rarity": None, "finished_at": None}
+        thread = threading.Thread(
+            target=process_nft_job,
+            args=(job_id, username, file_path, nft_name, description, recipient_pubkey, lat, long_val)
+        )
+        thread.start()
+        logging.info("upload route: Job %s started in background thread", job_id)
+        return jsonify({"success": True, "job_id": job_id}), 202
+    except RequestEntityTooLarge:
+        logging.info("upload route: Request body exceeds MAX_CONTENT_LENGTH")
+        return jsonify({"success": False, "message": "Image file is too large."}), 413
     except Exception as e:
         logging.error("upload route: Unhandled exception: %s", str(e))
         return jsonify({"success": False, "message": "An internal error occurred."}), 500
 
+# Poll the status of a background upload job
+@app.route('/upload_status/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job ID not found."}), 404
+    return jsonify({"success": True, "job_id": job_id, **job})
+
 @app.route('/samaira')
 def samaira():
     return "Hi Samaira!"
 
 if __name__ == '__main__':
-    if not os.path.exists(app.config['UPLOAD_FOLDER']):
-        os.makedirs(app.config['UPLOAD_FOLDER'])
     app.run(debug=True)
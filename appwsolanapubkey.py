@@ -1,6 +1,6 @@
 import os
 import subprocess
-import re
+import logging
 import json
 from flask import Flask, request, render_template, redirect, url_for, flash, jsonify
 from solders.keypair import Keypair
@@ -33,7 +33,7 @@ def load_users():
         with open(USERS_FILE, "r") as f:
             return json.load(f)  # Load users from JSON
     except (json.JSONDecodeError, FileNotFoundError):  # Handle empty or corrupted JSON
-        print("Warning: users.json was empty or corrupted. Resetting it.")
+        logging.warning("users.json was empty or corrupted; resetting")
         save_users({})  # Reset to empty JSON
         return {}
 
@@ -147,11 +147,12 @@ def upload():
             mint_output_str = mint_output.decode()
             print("Mint Output:\n", mint_output_str)
             
-            # Extract the mint address from the output using regex.
-            match = re.search(r'NFT created with address:\s*(\S+)', mint_output_str)
-            if match:
-                mint_address = match.group(1)
-            else:
+            # The last line of the mint script's output is {"mint_address": ...}.
+            try:
+                mint_address = json.loads(mint_output_str.strip().splitlines()[-1])["mint_address"]
+            except (IndexError, ValueError, KeyError):
+                mint_address = None
+            if not mint_address:
                 flash("Minting succeeded but mint address not found in output.")
         except subprocess.CalledProcessError as e:
             print("Error minting NFT:", e.output.decode())
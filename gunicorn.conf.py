@@ -0,0 +1,16 @@
+# Gunicorn settings for app.py. gunicorn reads this file automatically:
+#   gunicorn app:app
+# Set FLASK_SECRET_KEY (and optionally FERNET_KEY) in the environment so every
+# worker and restart uses the same keys; otherwise the Fernet key comes from
+# .fernet.key.
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+# Points (and points.json writes), upload job status, the cached users and their
+# NFT lists, and the NFT worker all live in process memory, so a second worker
+# would not see them (or would overwrite points.json). Pinned to one worker on
+# purpose rather than read from WEB_CONCURRENCY; scale with threads instead.
+workers = 1
+timeout = 60
@@ -8,7 +8,7 @@ const fs = require('fs');
 const path = require('path');
 // import path from 'path';
 
-async function createNFT(imagePath, name, symbol, description) {
+function makeMetaplex() {
   // 1. Set up a connection to the Solana Devnet.
   const connection = new Connection(clusterApiUrl('devnet'));
   const keypairPath = path.join(process.env.HOME, ".config", "solana", "id.json");
@@ -19,14 +19,17 @@ async function createNFT(imagePath, name, symbol, description) {
   const QUICKNODE_RPC = 'https://api.devnet.solana.com'; // Replace with your RPC URL if needed
 
   // 3. Initialize Metaplex with your wallet and configure Irys storage.
-  const metaplex = Metaplex.make(connection)
+  return Metaplex.make(connection)
     .use(keypairIdentity(wallet))
     .use(irysStorage({
       address: 'https://devnet.irys.xyz',
       providerUrl: QUICKNODE_RPC,
       timeout: 120000,
     }));
+}
 
+// Pass a metaplex instance to reuse its connection across calls.
+async function createNFT(imagePath, name, symbol, description, metaplex = makeMetaplex()) {
   // 4. Read the image file from disk and convert it to a Metaplex file.
   const imageBuffer = fs.readFileSync(imagePath);
   const file = toMetaplexFile(imageBuffer, 'image.png');
@@ -43,7 +46,7 @@ async function createNFT(imagePath, name, symbol, description) {
     symbol: symbol,
     creators: [
       {
-        address: wallet.publicKey,
+        address: metaplex.identity().publicKey,
         verified: true,
         share: 100,
       },
@@ -51,10 +54,26 @@ async function createNFT(imagePath, name, symbol, description) {
   });
 
   console.log('NFT created with address:', nft.address.toBase58());
+  return nft;
 }
 
-// Call the function with your image file path and metadata
-createNFT('image.png', 'My NFT Name', 'MYNFT', 'This is a description of my NFT.')
-  .catch(err => {
-    console.error(err);
-  });
+module.exports = { makeMetaplex, createNFT };
+
+if (require.main === module) {
+  // Usage: node mintNFT.js [imagePath] [name] [symbol] [description]
+  const [
+    imagePath = 'image.png',
+    name = 'My NFT Name',
+    symbol = 'MYNFT',
+    description = 'This is a description of my NFT.',
+  ] = process.argv.slice(2);
+  createNFT(imagePath, name, symbol, description)
+    .then(nft => {
+      // The last stdout line is the machine-readable result for callers.
+      console.log(JSON.stringify({ mint_address: nft.address.toBase58() }));
+    })
+    .catch(err => {
+      console.error(err);
+      process.exitCode = 1;
+    });
+}
@@ -0,0 +1,63 @@
+// nft_worker.js
+// Long-running NFT worker for app.py. Reads one JSON command per line on stdin
+// and writes one JSON reply per line on stdout:
+//   {"id", "cmd": "mint", "image_path", "name", "symbol", "description"} -> {"id", "ok": true, "mint_address"}
+//   {"id", "cmd": "send", "mint_address", "recipient"}                      -> {"id", "ok": true}
+// Failures reply {"id", "ok": false, "error": "..."}. Every reply echoes the
+// command's id so app.py can tell if replies and commands ever fall out of step.
+const readline = require('readline');
+const { PublicKey } = require('@solana/web3.js');
+
+// stdout carries the protocol, so route all console logging to stderr. Anything
+// else that still reaches stdout fails app.py's id check and restarts the worker.
+console.log = console.info = console.debug = (...args) => console.error(...args);
+
+const { makeMetaplex, createNFT } = require('./mintNFT');
+
+// One Metaplex instance (and RPC connection) for the life of the worker.
+const metaplex = makeMetaplex();
+
+async function sendNFT(mintAddress, recipient) {
+  const nft = await metaplex.nfts().findByMint({ mintAddress: new PublicKey(mintAddress) });
+  await metaplex.nfts().transfer({
+    nftOrSft: nft,
+    toOwner: new PublicKey(recipient),
+  });
+  console.log('NFT', mintAddress, 'sent to', recipient);
+}
+
+async function handle(request) {
+  switch (request.cmd) {
+    case 'mint': {
+      const nft = await createNFT(request.image_path, request.name, request.symbol, request.description, metaplex);
+      return { ok: true, mint_address: nft.address.toBase58() };
+    }
+    case 'send':
+      await sendNFT(request.mint_address, request.recipient);
+      return { ok: true };
+    default:
+      return { ok: false, error: `Unknown command: ${request.cmd}` };
+  }
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+// Commands are handled one at a time, in the order they arrive.
+let queue = Promise.resolve();
+rl.on('line', line => {
+  queue = queue.then(async () => {
+    let request = {};
+    let reply;
+    try {
+      request = JSON.parse(line);
+      reply = await handle(request);
+    } catch (err) {
+      console.error(err);
+      reply = { ok: false, error: String(err && err.message ? err.message : err) };
+    }
+    reply.id = request && request.id !== undefined ? request.id : null;
+    process.stdout.write(JSON.stringify(reply) + '\n');
+  });
+});
+rl.on('close', () => {
+  queue.then(() => process.exit(0));
+});
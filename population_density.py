@@ -1,50 +1,226 @@
+import asyncio
+import collections
+import functools
+import logging
+import operator
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# One administrative area from Overpass; a tuple is smaller and cheaper to build than a dict.
+Area = collections.namedtuple("Area", "name wikidata_id admin_level")
+
+# Shared session so repeated calls to Overpass and Wikidata reuse keep-alive
+# connections instead of paying a TCP+TLS handshake per request. Responses are
+# cached on disk (popdens.sqlite): admin areas for an hour, Wikidata for a week.
+# If a refresh fails, the last cached (stale) response is served instead.
+# Overpass and SPARQL queries are sent as POST bodies (long VALUES lists would
+# overflow the URL), so POST responses are cached too, keyed on the body.
+_TIMEOUT = (3.05, 20)  # (connect, read) seconds
+_MAX_WORKERS = 8  # concurrent lookups in flight
+_SESSION = requests_cache.CachedSession(
+    cache_name="popdens",
+    backend="sqlite",
+    expire_after=24 * 60 * 60,
+    urls_expire_after={
+        "overpass-api.de": 60 * 60,
+        "query.wikidata.org": 7 * 24 * 60 * 60,
+        "www.wikidata.org/w/api.php": 7 * 24 * 60 * 60,
+    },
+    allowable_methods=("GET", "HEAD", "POST"),
+    stale_if_error=True,
+)
+_SESSION.headers.update({
+    "User-Agent": "hackathon_nft-population-density/1.0 (python-requests)",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+})
+# Each host's pool holds more connections than there are worker threads, so a
+# burst of concurrent lookups finds warm connections and none are discarded
+# (urllib3 drops connections returned to a full pool, forcing new handshakes).
+# Transient failures are retried with exponential backoff (0.5s, 1s, 2s, ...);
+# the POSTed queries are read-only, so they are retried like GETs; on 429 the
+# server's Retry-After header is honored (Overpass rate-limits aggressively).
+# Once retries are exhausted, stale_if_error falls back to the cached response.
+_ADAPTER = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=2 * _MAX_WORKERS,
+    max_retries=Retry(
+        total=4,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+        respect_retry_after_header=True,
+    ),
+)
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+# Worker threads for concurrent Wikidata lookups; they share _SESSION's pool.
+_EXECUTOR = ThreadPoolExecutor(max_workers=_MAX_WORKERS)
+
+_WIKIDATA_SPARQL_URL = "https://query.wikidata.org/sparql"
+_SPARQL_HEADERS = {
+    "Accept": "application/sparql-results+json",
+    "Content-Type": "application/x-www-form-urlencoded",
+}
+# OSM wikidata tags are occasionally malformed (e.g. "Q1;Q2"); one bad ID would
+# make a whole batched SPARQL query fail, so only well-formed IDs are sent.
+_QID_RE = re.compile(r"Q[0-9]+")
+
+# Wikidata IDs known to lack usable population data, mapped to (timestamp, error
+# message). Intermediate admin levels often have no P1082; remembering that for a
+# week skips their SPARQL round-trip on later lookups. Request failures are never
+# stored. Insertion order doubles as age order for evicting the oldest entry.
+_NEGATIVE_TTL = 7 * 24 * 60 * 60  # seconds
+_NEGATIVE_MAXSIZE = 10_000
+_negative_cache = {}
+_negative_cache_lock = threading.Lock()
+
+def _get_negative(wikidata_id):
+    """Returns the cached error message for a Wikidata ID, or None if absent or expired."""
+    with _negative_cache_lock:
+        entry = _negative_cache.get(wikidata_id)
+    if entry is not None and time.time() - entry[0] < _NEGATIVE_TTL:
+        return entry[1]
+    return None
+
+def _remember_negative(wikidata_id, error):
+    """Caches a no-data result for a Wikidata ID and returns its error dict."""
+    with _negative_cache_lock:
+        _negative_cache.pop(wikidata_id, None)
+        if len(_negative_cache) >= _NEGATIVE_MAXSIZE:
+            del _negative_cache[next(iter(_negative_cache))]
+        _negative_cache[wikidata_id] = (time.time(), error)
+    return {"error": error}
+
+# Precomputed getters for SPARQL JSON bindings ({"var": {"value": ...}}) and
+# Overpass tags; itemgetter runs in C instead of chained __getitem__ bytecode.
+_get_value = operator.itemgetter("value")
+_get_item = operator.itemgetter("item")
+_get_population = operator.itemgetter("population")
+_get_area = operator.itemgetter("area")
+_get_name_and_wikidata = operator.itemgetter("name", "wikidata")
+
+# Query templates are built once; the lru_cached builders below turn them into
+# form-encoded POST bodies, so re-queried IDs (retries, alternatives shared by
+# several areas) skip string building and urlencoding.
+# Overpass's server-side [timeout:] is kept below the client read timeout so a
+# slow query fails on the server instead of leaving the socket hanging.
+_OVERPASS_TMPL = """
+[out:json][timeout:15];
+is_in({lat},{lon})->.a;
+area.a["boundary"="administrative"]["wikidata"]["name"];
+out tags;
+"""
+_SPARQL_TMPL = """
+SELECT ?population ?area WHERE {{
+  {{ wd:{qid} wdt:P1082 ?population . }}
+  UNION
+  {{ wd:{qid} p:P1082 ?popStatement . ?popStatement ps:P1082 ?population . }}
+  OPTIONAL {{ wd:{qid} wdt:P2046 ?area . }}
+}} LIMIT 1
+"""
+# Batched lookups: truthy population first, then full statements for the rest.
+_SPARQL_TRUTHY_BATCH_TMPL = """
+SELECT ?item ?population ?area WHERE {{
+  VALUES ?item {{ {values} }}
+  OPTIONAL {{ ?item wdt:P1082 ?population . }}
+  OPTIONAL {{ ?item wdt:P2046 ?area . }}
+}}
+"""
+_SPARQL_STATEMENT_BATCH_TMPL = """
+SELECT ?item ?population ?area WHERE {{
+  VALUES ?item {{ {values} }}
+  ?item p:P1082 ?popStatement .
+  ?popStatement ps:P1082 ?population .
+  OPTIONAL {{ ?item wdt:P2046 ?area . }}
+}}
+"""
+
+@functools.lru_cache(maxsize=1024)
+def _build_query_body(wikidata_id):
+    """Form-encoded SPARQL body for a single-ID population lookup."""
+    return urllib.parse.urlencode({"query": _SPARQL_TMPL.format(qid=wikidata_id)})
+
+@functools.lru_cache(maxsize=256)
+def _build_batch_query_body(template, wikidata_ids):
+    """Form-encoded SPARQL body for a batched lookup over a sorted tuple of IDs."""
+    values = " ".join(f"wd:{wikidata_id}" for wikidata_id in wikidata_ids)
+    return urllib.parse.urlencode({"query": template.format(values=values)})
+
+@functools.lru_cache(maxsize=4096)
+def _get_areas_cached(lat_q, lon_q):
+    """
+    Runs the Overpass query for a coordinate snapped to the cache grid.
+    
+    Args:
+        lat_q (float): Latitude rounded to 3 decimals (~110 m).
+        lon_q (float): Longitude rounded to 3 decimals.
+    
+    Returns:
+        tuple: Area records sorted in descending order by admin_level,
+               one per distinct Wikidata ID.
+               Request and decode errors are raised rather than returned, so failures are never cached.
+    """
+    overpass_url = "http://overpass-api.de/api/interpreter"
+    # The query returns all administrative areas with a Wikidata tag.
+    overpass_query = _OVERPASS_TMPL.format(lat=lat_q, lon=lon_q)
+    response = _SESSION.post(
+        overpass_url,
+        data={"data": overpass_query},
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        timeout=_TIMEOUT,
+    )
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    # The query filter guarantees "name" and "wikidata" tags on every element.
+    areas = [
+        Area(*_get_name_and_wikidata(tags), int(tags["admin_level"]) if tags.get("admin_level", "").isdigit() else 99)
+        for tags in (element.get("tags") for element in data.get("elements", ()))
+        if tags
+    ]
+    # Sort by admin_level in descending order: higher admin_level means a smaller area.
+    areas.sort(key=operator.attrgetter("admin_level"), reverse=True)
+    # Border regions often return several relations sharing one Wikidata ID; keep the
+    # smallest of each and drop blank IDs so no SPARQL round-trip is spent on them.
+    seen = set()
+    return tuple(
+        area for area in areas
+        if area.wikidata_id.strip() and not (area.wikidata_id in seen or seen.add(area.wikidata_id))
+    )
 
 def get_osm_administrative_areas(lat, lon):
     """
     Queries OpenStreetMap (Overpass API) to retrieve all administrative areas
     that contain the given latitude and longitude and have a Wikidata tag.
+    Coordinates are snapped to 3 decimals (~110 m) and results are memoized per
+    grid cell, since administrative boundaries are stable at that resolution.
     
     Args:
         lat (float): Latitude of the location.
         lon (float): Longitude of the location.
     
     Returns:
-        list: A list of dictionaries containing administrative area name, Wikidata ID,
-              and admin_level, sorted in descending order by admin_level (smallest area first).
-    """
-    overpass_url = "http://overpass-api.de/api/interpreter"
-    # The query returns all administrative areas with a Wikidata tag.
-    overpass_query = f"""
-    [out:json];
-    is_in({lat},{lon})->.a;
-    area.a["boundary"="administrative"]["wikidata"]["name"];
-    out body;
+        list: Area records (name, wikidata_id, admin_level) sorted in descending order
+              by admin_level (smallest area first).
     """
     try:
-        response = requests.get(overpass_url, params={"data": overpass_query})
-        response.raise_for_status()
-        data = response.json()
-        areas = []
-        if "elements" in data and len(data["elements"]) > 0:
-            for element in data["elements"]:
-                if "tags" in element and "wikidata" in element["tags"]:
-                    try:
-                        admin_level = int(element["tags"].get("admin_level", 99))
-                    except ValueError:
-                        admin_level = 99
-                    areas.append({
-                        "name": element["tags"].get("name"),
-                        "wikidata_id": element["tags"].get("wikidata"),
-                        "admin_level": admin_level
-                    })
-            # Sort by admin_level in descending order: higher admin_level means a smaller area.
-            sorted_areas = sorted(areas, key=lambda x: x["admin_level"], reverse=True)
-            return sorted_areas
-        return []
-    except requests.exceptions.RequestException as e:
-        print("Request error:", e)
+        areas = _get_areas_cached(round(lat, 3), round(lon, 3))
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+        logger.warning("Overpass request error: %s", e)
         return []
+    return list(areas)
 
 def get_population_and_area_wikidata(wikidata_id):
     """
@@ -59,59 +235,142 @@ def get_population_and_area_wikidata(wikidata_id):
         dict: Population, area, and calculated population density if available;
               otherwise an error message.
     """
-    wikidata_url = "https://query.wikidata.org/sparql"
-    sparql_query = f"""
-    SELECT ?population ?area WHERE {{
-      {{
-        wd:{wikidata_id} wdt:P1082 ?population .
-      }}
-      UNION
-      {{
-        wd:{wikidata_id} p:P1082 ?popStatement .
-        ?popStatement ps:P1082 ?population .
-      }}
-      OPTIONAL {{ wd:{wikidata_id} wdt:P2046 ?area . }}
-    }} LIMIT 1
-    """
-    headers = {"Accept": "application/json"}
+    negative = _get_negative(wikidata_id)
+    if negative is not None:
+        return {"error": negative}
 
     try:
-        response = requests.get(wikidata_url, params={"query": sparql_query, "format": "json"}, headers=headers)
+        response = _SESSION.post(_WIKIDATA_SPARQL_URL, data=_build_query_body(wikidata_id), headers=_SPARQL_HEADERS, timeout=_TIMEOUT)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
 
         if ("results" in data and "bindings" in data["results"] and 
             len(data["results"]["bindings"]) > 0):
             result = data["results"]["bindings"][0]
             try:
-                population = int(result["population"]["value"])
+                population = int(_get_value(_get_population(result)))
             except (KeyError, ValueError):
-                return {"error": "Population data is not in a valid format."}
+                return _remember_negative(wikidata_id, "Population data is not in a valid format.")
             area = None
             if "area" in result:
                 try:
-                    area = float(result["area"]["value"])
+                    area = float(_get_value(_get_area(result)))
                 except ValueError:
                     area = None
 
-            if area:
-                density = population / area  # Compute population density
-                return {
-                    "population": population,
-                    "area_km2": area,
-                    "population_density": density
-                }
-            else:
-                return {
-                    "population": population,
-                    "area_km2": "Unknown",
-                    "population_density": "Cannot calculate (no area data)"
-                }
-        return {"error": "No population or area data found for this Wikidata ID."}
-    
-    except requests.exceptions.RequestException as e:
+            return _population_record(population, area)
+        return _remember_negative(wikidata_id, "No population or area data found for this Wikidata ID.")
+    
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         return {"error": f"Request failed: {str(e)}"}
 
+def _population_record(population, area):
+    """
+    Builds the population result for an administrative region.
+    
+    Args:
+        population (int): Population of the region.
+        area (float or None): Area of the region in km², if known.
+    
+    Returns:
+        dict: Population, area, and population density (placeholders if the area is unknown).
+    """
+    if area:
+        density = population / area  # Compute population density
+        return {
+            "population": population,
+            "area_km2": area,
+            "population_density": density
+        }
+    else:
+        return {
+            "population": population,
+            "area_km2": "Unknown",
+            "population_density": "Cannot calculate (no area data)"
+        }
+
+def _query_population_rows(template, wikidata_ids):
+    """
+    Runs a batched population/area SPARQL query.
+    
+    Args:
+        template (str): Query template selecting ?item, ?population and ?area for {values}.
+        wikidata_ids (list): Wikidata IDs to bind to ?item.
+    
+    Returns:
+        dict: {wikidata_id: {"population": str or None, "area": str or None}} using the
+              first value seen for each item. Request and decode errors are raised.
+    """
+    body = _build_batch_query_body(template, tuple(sorted(wikidata_ids)))
+    response = _SESSION.post(_WIKIDATA_SPARQL_URL, data=body, headers=_SPARQL_HEADERS, timeout=_TIMEOUT)
+    response.raise_for_status()
+    rows = {}
+    for binding in orjson.loads(response.content).get("results", {}).get("bindings", []):
+        wikidata_id = _get_value(_get_item(binding)).rsplit("/", 1)[-1]
+        row = rows.setdefault(wikidata_id, {"population": None, "area": None})
+        if row["population"] is None and "population" in binding:
+            row["population"] = _get_value(_get_population(binding))
+        if row["area"] is None and "area" in binding:
+            row["area"] = _get_value(_get_area(binding))
+    return rows
+
+def get_population_and_area_wikidata_batch(wikidata_ids):
+    """
+    Queries Wikidata for the population and area of several administrative regions
+    with a single SPARQL request. Population comes from the truthy property (wdt:P1082);
+    IDs without one are retried together against the full statements (p:P1082),
+    matching the UNION used by get_population_and_area_wikidata.
+    
+    Args:
+        wikidata_ids (list): Wikidata IDs of the administrative regions.
+    
+    Returns:
+        dict: Maps each Wikidata ID to the same kind of dict that
+              get_population_and_area_wikidata returns.
+    """
+    ids = list(dict.fromkeys(wikidata_ids))
+    results = {
+        wikidata_id: {"error": "Invalid Wikidata ID."}
+        for wikidata_id in ids if not _QID_RE.fullmatch(wikidata_id or "")
+    }
+    for wikidata_id in ids:
+        if wikidata_id not in results:
+            negative = _get_negative(wikidata_id)
+            if negative is not None:
+                results[wikidata_id] = {"error": negative}
+    ids = [wikidata_id for wikidata_id in ids if wikidata_id not in results]
+    if not ids:
+        return results
+
+    try:
+        rows = _query_population_rows(_SPARQL_TRUTHY_BATCH_TMPL, ids)
+        missing = [wikidata_id for wikidata_id in ids if not rows.get(wikidata_id, {}).get("population")]
+        if missing:
+            rows.update(_query_population_rows(_SPARQL_STATEMENT_BATCH_TMPL, missing))
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+        for wikidata_id in ids:
+            results[wikidata_id] = {"error": f"Request failed: {str(e)}"}
+        return results
+
+    for wikidata_id in ids:
+        row = rows.get(wikidata_id, {})
+        if not row.get("population"):
+            results[wikidata_id] = _remember_negative(wikidata_id, "No population or area data found for this Wikidata ID.")
+            continue
+        try:
+            population = int(row["population"])
+        except ValueError:
+            results[wikidata_id] = _remember_negative(wikidata_id, "Population data is not in a valid format.")
+            continue
+        area = None
+        if row.get("area"):
+            try:
+                area = float(row["area"])
+            except ValueError:
+                area = None
+        results[wikidata_id] = _population_record(population, area)
+    return results
+
 def search_alternative_wikidata_ids(area_name):
     """
     Searches Wikidata for alternative entities with the given name.
@@ -130,14 +389,14 @@ def search_alternative_wikidata_ids(area_name):
         "format": "json"
     }
     try:
-        response = requests.get(search_url, params=params)
+        response = _SESSION.get(search_url, params=params, timeout=_TIMEOUT)
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content)
         results = data.get("search", [])
         # Return candidate IDs, excluding duplicates (and possibly the one we already tried)
         return [r["id"] for r in results]
-    except requests.exceptions.RequestException as e:
-        print("Error searching Wikidata:", e)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+        logger.warning("Error searching Wikidata: %s", e)
         return []
 
 def get_population_density(lat, lon):
@@ -160,44 +419,76 @@ def get_population_density(lat, lon):
     if not areas:
         return {"error": "No administrative areas found for this location."}
     
+    # Fetch population data for every area's Wikidata ID in one batched query.
+    population_by_id = get_population_and_area_wikidata_batch([area.wikidata_id for area in areas])
+    
+    # Areas smaller than the first one with data may still be rescued by an alternative
+    # Wikidata ID: search their names concurrently and batch all candidates into one query.
+    first_valid = next(
+        (i for i, area in enumerate(areas) if "error" not in population_by_id[area.wikidata_id]),
+        len(areas)
+    )
+    alternatives_by_area = list(_EXECUTOR.map(search_alternative_wikidata_ids, [area.name for area in areas[:first_valid]]))
+    alt_ids = {alt_id for alternatives in alternatives_by_area for alt_id in alternatives if alt_id not in population_by_id}
+    if alt_ids:
+        population_by_id.update(get_population_and_area_wikidata_batch(alt_ids))
+    
     # Loop over areas starting with the smallest (highest admin_level) and move to larger areas.
-    for area in areas:
-        wikidata_id = area["wikidata_id"]
-        print(f"Trying area '{area['name']}' with Wikidata ID: {wikidata_id}")
-        population_data = get_population_and_area_wikidata(wikidata_id)
+    # Alternatives often repeat across nested areas with similar names; each is tried once.
+    tried = set()
+    for i, area in enumerate(areas):
+        wikidata_id = area.wikidata_id
+        logger.debug("Trying area '%s' with Wikidata ID: %s", area.name, wikidata_id)
+        tried.add(wikidata_id)
+        population_data = population_by_id[wikidata_id]
         if "error" not in population_data:
             return {
-                "location": area["name"],
-                "admin_level": area["admin_level"],
+                "location": area.name,
+                "admin_level": area.admin_level,
                 "population": population_data["population"],
                 "area_km2": population_data["area_km2"],
                 "population_density": population_data["population_density"]
             }
         else:
-            print(f"Area '{area['name']}' (Wikidata ID: {wikidata_id}) did not return valid data.")
-            # Try searching for alternative Wikidata IDs using the area name.
-            alternatives = search_alternative_wikidata_ids(area["name"])
-            for alt_id in alternatives:
-                # Skip if it's the same as the one we already tried.
-                if alt_id == wikidata_id:
+            logger.debug("Area '%s' (Wikidata ID: %s) did not return valid data.", area.name, wikidata_id)
+            for alt_id in alternatives_by_area[i]:
+                # Skip IDs already tried for this or a smaller area.
+                if alt_id in tried:
                     continue
-                print(f"Trying alternative Wikidata ID: {alt_id} for area '{area['name']}'")
-                alt_population_data = get_population_and_area_wikidata(alt_id)
+                tried.add(alt_id)
+                logger.debug("Trying alternative Wikidata ID: %s for area '%s'", alt_id, area.name)
+                alt_population_data = population_by_id[alt_id]
                 if "error" not in alt_population_data:
                     return {
-                        "location": area["name"],
-                        "admin_level": area["admin_level"],
+                        "location": area.name,
+                        "admin_level": area.admin_level,
                         "population": alt_population_data["population"],
                         "area_km2": alt_population_data["area_km2"],
                         "population_density": alt_population_data["population_density"],
                         "wikidata_id": alt_id  # indicate alternative ID used
                     }
-            print(f"No alternative Wikidata IDs for '{area['name']}' returned valid data. Trying a larger area...")
+            logger.debug("No alternative Wikidata IDs for '%s' returned valid data. Trying a larger area...", area.name)
     
     return {"error": "Could not fetch population or area data from Wikidata for any administrative area."}
 
+async def get_population_density_async(lat, lon):
+    """
+    Asyncio entry point for get_population_density. The lookup runs in a worker thread,
+    so an event loop can await several locations concurrently; each one still batches
+    its Wikidata queries and fans out alternative-ID searches on _EXECUTOR.
+    
+    Args:
+        lat (float): Latitude of the location.
+        lon (float): Longitude of the location.
+    
+    Returns:
+        dict: Same result as get_population_density.
+    """
+    return await asyncio.to_thread(get_population_density, lat, lon)
+
 # Example Usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(name)s: %(message)s")
     # Example coordinates for New Delhi, India.
     latitude = 27.7785
     longitude = 87.9482
@@ -7,7 +7,6 @@ from solders.keypair import Keypair
 import base58
 from cryptography.fernet import Fernet
 import subprocess
-import re
 import logging
 import random
 import threading
@@ -40,9 +39,11 @@ def process_nft_job(qid, file_path, nft_name, description, recipient_pubkey, use
         mint_output_str = mint_output.decode()
         logging.info("Thread %s: Mint Output: %s", qid, mint_output_str)
         
-        match = re.search(r'NFT created with address:\s*(\S+)', mint_output_str)
-        if match:
-            mint_address = match.group(1)
+        try:
+            mint_address = json.loads(mint_output_str.strip().splitlines()[-1])["mint_address"]
+        except (IndexError, ValueError, KeyError):
+            mint_address = None
+        if mint_address:
             jobs[qid]["mint_address"] = mint_address
             logging.info("Thread %s: Mint address extracted: %s", qid, mint_address)
         else: